@@ -1,5 +1,8 @@
 # backend/app.py
 import os
+import io
+import re
+import json
 import uuid
 import base64
 import sqlite3
@@ -9,22 +12,35 @@ from flask import Flask, request, jsonify, send_from_directory, render_template,
 from werkzeug.utils import secure_filename
 from reportlab.pdfgen import canvas as pdfcanvas
 from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
 from PyPDF2 import PdfReader, PdfWriter
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTChar, LTContainer
 from PIL import Image
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Optional: Arabic shaping for template field values (pip install arabic-reshaper python-bidi)
+try:
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+except ImportError:
+    arabic_reshaper = None
+    get_display = None
+
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = BASE_DIR / "data"
+DATA_DIR = Path(os.getenv("DATA_DIR", BASE_DIR / "data"))
 CONTRACTS_DIR = DATA_DIR / "contracts"
 PDFS_DIR = DATA_DIR / "pdfs"
 SIGN_DIR = DATA_DIR / "signatures"
 SIGNED_DIR = DATA_DIR / "signed"
+TEMPLATES_DIR = DATA_DIR / "contract_templates"
 DB_PATH = DATA_DIR / "db.sqlite3"
 
-for d in (DATA_DIR, CONTRACTS_DIR, PDFS_DIR, SIGN_DIR, SIGNED_DIR):
+for d in (DATA_DIR, CONTRACTS_DIR, PDFS_DIR, SIGN_DIR, SIGNED_DIR, TEMPLATES_DIR):
     d.mkdir(parents=True, exist_ok=True)
 
 app = Flask(__name__, template_folder=str(BASE_DIR / "templates"), static_folder=str(BASE_DIR / "static"))
@@ -48,6 +64,16 @@ def init_db():
         signed_pdf TEXT
     )
     """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS contract_templates (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        filename TEXT,
+        pdf_filename TEXT,
+        fields TEXT,
+        created_at TEXT
+    )
+    """)
     conn.commit()
     conn.close()
 
@@ -58,6 +84,15 @@ def db_execute(query, params=()):
     conn.commit()
     conn.close()
 
+def db_executemany(query, rows):
+    """Run the same statement for every row in one transaction."""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        with conn:
+            conn.executemany(query, rows)
+    finally:
+        conn.close()
+
 def db_fetchone(query, params=()):
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
@@ -135,6 +170,165 @@ def merge_overlay_onto_pdf(base_pdf_path: Path, overlay_pdf_path: Path, out_pdf_
         writer.write(f)
     return out_pdf_path
 
+# ---------- Contract templates ----------
+# A template is a DOCX containing placeholders such as {{second_party}} or {{monthly_fee}}
+# (named after the contract columns). It is converted to PDF once; each contract is then
+# produced by stamping the field values over the placeholder positions of the cached PDF.
+# In an Arabic paragraph the braces are bidi-mirrored, so "}}name{{" is accepted as well.
+PLACEHOLDER_RE = re.compile(r"(\{\{|\}\})\s*(\w+)\s*(\}\}|\{\{)")
+TEMPLATE_FONT_NAME = "TemplateFont"
+MIN_FIELD_FONT_SIZE = 6
+
+def get_template_font():
+    """
+    Register the TTF used for field values once. Needs a font with Arabic glyphs;
+    falls back to Helvetica (Latin only) if the font file is missing.
+    """
+    if TEMPLATE_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return TEMPLATE_FONT_NAME
+    font_path = os.getenv("TEMPLATE_FONT_PATH") or os.getenv("SIGN_FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+    try:
+        pdfmetrics.registerFont(TTFont(TEMPLATE_FONT_NAME, font_path))
+    except Exception as e:
+        app.logger.warning("Template font %s could not be loaded (%s); using Helvetica", font_path, e)
+        return "Helvetica"
+    return TEMPLATE_FONT_NAME
+
+def is_rtl_text(text):
+    return any("\u0590" <= ch <= "\u08ff" or "\ufb50" <= ch <= "\ufeff" for ch in text)
+
+def rtl_support_problem():
+    """Return why Arabic values can't be rendered, or None if they can."""
+    if arabic_reshaper is None:
+        return "Arabic shaping needs the arabic-reshaper and python-bidi packages"
+    font = get_template_font()
+    if font == "Helvetica" or ord("\u0627") not in pdfmetrics.getFont(font).face.charToGlyph:
+        return "Template font has no Arabic glyphs; set TEMPLATE_FONT_PATH to a TTF with Arabic support"
+    return None
+
+def shape_text(text):
+    """Reshape Arabic letters and reorder for visual (left-to-right) drawing."""
+    if arabic_reshaper is None or not is_rtl_text(text):
+        return text
+    return get_display(arabic_reshaper.reshape(text))
+
+def iter_pdf_chars(layout_obj):
+    for obj in layout_obj:
+        if isinstance(obj, LTChar):
+            yield obj
+        elif isinstance(obj, LTContainer):
+            yield from iter_pdf_chars(obj)
+
+def group_chars_into_lines(chars):
+    """Group glyphs sharing a baseline and order each line visually (left to right)."""
+    lines = []
+    for ch in sorted(chars, key=lambda ch: -ch.matrix[5]):
+        baseline = ch.matrix[5]
+        if lines and abs(lines[-1][0] - baseline) <= ch.size * 0.3:
+            lines[-1][1].append(ch)
+        else:
+            lines.append((baseline, [ch]))
+    return [sorted(line, key=lambda ch: ch.x0) for _, line in lines]
+
+def extract_template_fields(pdf_path: Path):
+    """
+    Scan a converted template PDF and return the placeholder positions:
+    [{"name", "page", "x", "y", "width", "bottom", "height", "font_size"}, ...]
+    in PDF points (bottom-left origin, y is the baseline).
+    Positions come from each glyph's box in the template's own fonts, so placeholders
+    can sit anywhere in a line, including inside right-to-left text.
+    """
+    fields = []
+    for page_index, page_layout in enumerate(extract_pages(str(pdf_path), laparams=None)):
+        chars = [ch for ch in iter_pdf_chars(page_layout) if ch.upright]
+        for line in group_chars_into_lines(chars):
+            # map every character of the visual line text back to its glyph
+            text, owners = "", []
+            for ch in line:
+                text += ch.get_text()
+                owners.extend([ch] * len(ch.get_text()))
+            for m in PLACEHOLDER_RE.finditer(text):
+                if m.group(1) == m.group(3):
+                    continue
+                name = m.group(2)
+                if is_rtl_text(name):
+                    name = name[::-1]
+                glyphs = owners[m.start():m.end()]
+                x0 = min(g.x0 for g in glyphs)
+                bottom = min(g.y0 for g in glyphs)
+                fields.append({
+                    "name": name,
+                    "page": page_index,
+                    "x": round(x0, 2),
+                    "y": round(glyphs[0].matrix[5], 2),
+                    "width": round(max(g.x1 for g in glyphs) - x0, 2),
+                    "bottom": round(bottom, 2),
+                    "height": round(max(g.y1 for g in glyphs) - bottom, 2),
+                    "font_size": round(max(g.size for g in glyphs), 2),
+                })
+    return fields
+
+def field_value(values, name):
+    value = values.get(name)
+    return "" if value is None else str(value)
+
+def fit_field_font_size(field, text, font):
+    """
+    Font size at which text fits inside the placeholder width: the placeholder's own
+    size if it fits, else shrunk to fit. Returns None if it would go below MIN_FIELD_FONT_SIZE.
+    """
+    size = field["font_size"]
+    width = pdfmetrics.stringWidth(text, font, size)
+    if width <= field["width"]:
+        return size
+    size = size * field["width"] / width
+    return size if size >= MIN_FIELD_FONT_SIZE else None
+
+def stamp_template_fields(base_pdf_bytes, fields, values, out_pdf_path: Path):
+    """
+    Draw the field values onto the template PDF. Each placeholder is covered with a
+    white box and the value written over it (right-aligned for Arabic text), shrunk
+    to the placeholder width if needed. Missing values leave the placeholder blank.
+    Raises ValueError if a value can't fit its placeholder.
+    """
+    reader = PdfReader(io.BytesIO(base_pdf_bytes))
+    font = get_template_font()
+    by_page = {}
+    for field in fields:
+        by_page.setdefault(field["page"], []).append(field)
+
+    writer = PdfWriter()
+    for i, page in enumerate(reader.pages):
+        if i in by_page:
+            width_pts = float(page.mediabox.width)
+            height_pts = float(page.mediabox.height)
+            buf = io.BytesIO()
+            c = pdfcanvas.Canvas(buf, pagesize=(width_pts, height_pts))
+            for field in by_page[i]:
+                c.setFillColorRGB(1, 1, 1)
+                c.rect(field["x"], field["bottom"], field["width"], field["height"], stroke=0, fill=1)
+                value = field_value(values, field["name"])
+                if not value:
+                    continue
+                text = shape_text(value)
+                size = fit_field_font_size(field, text, font)
+                if size is None:
+                    raise ValueError(f"Value for {field['name']} is too long for its placeholder")
+                c.setFillColorRGB(0, 0, 0)
+                c.setFont(font, size)
+                if is_rtl_text(value):
+                    c.drawRightString(field["x"] + field["width"], field["y"], text)
+                else:
+                    c.drawString(field["x"], field["y"], text)
+            c.save()
+            buf.seek(0)
+            page.merge_page(PdfReader(buf).pages[0])
+        writer.add_page(page)
+
+    with open(out_pdf_path, "wb") as f:
+        writer.write(f)
+    return out_pdf_path
+
 # ---------- API endpoints ----------
 
 @app.route("/health")
@@ -172,6 +366,141 @@ def upload_contract():
     sign_link = url_for("sign_page", contract_id=contract_id, token=token, _external=True)
     return jsonify({"success": True, "contract_id": contract_id, "pdf": pdf_url, "sign_link": sign_link})
 
+@app.route("/api/templates/upload", methods=["POST"])
+def upload_template():
+    """
+    Upload a .docx contract template with {{field}} placeholders.
+    It is converted to PDF once and the placeholder positions are stored.
+    Expected form fields:
+      - file: file upload (.docx)
+      - name (optional)
+    """
+    if "file" not in request.files:
+        return jsonify({"success": False, "message": "Missing file"}), 400
+    f = request.files["file"]
+    name = request.form.get("name") or f.filename
+    template_id = "TP-" + uuid.uuid4().hex[:8].upper()
+    filename = secure_filename(f.filename)
+    docx_path = TEMPLATES_DIR / f"{template_id}_{filename}"
+    pdf_path = docx_path.with_suffix(".pdf")
+    f.save(docx_path)
+
+    def discard(response, status):
+        docx_path.unlink(missing_ok=True)
+        pdf_path.unlink(missing_ok=True)
+        return jsonify(response), status
+
+    try:
+        pdf_path = convert_docx_to_pdf(docx_path, TEMPLATES_DIR)
+    except (subprocess.CalledProcessError, OSError) as e:
+        return discard({"success": False, "message": "Conversion failed. Ensure LibreOffice is installed on server.", "error": str(e)}, 500)
+
+    try:
+        fields = extract_template_fields(pdf_path)
+    except Exception as e:
+        return discard({"success": False, "message": "Could not read placeholders from template", "error": str(e)}, 400)
+    if not fields:
+        return discard({"success": False, "message": "No {{field}} placeholders found in template"}, 400)
+
+    db_execute("""
+      INSERT INTO contract_templates (id, name, filename, pdf_filename, fields, created_at)
+      VALUES (?, ?, ?, ?, ?, ?)
+    """, (template_id, name, docx_path.name, pdf_path.name, json.dumps(fields), datetime.utcnow().isoformat()))
+
+    result = {"success": True, "template_id": template_id, "fields": sorted({fd["name"] for fd in fields})}
+    problem = rtl_support_problem()
+    if problem:
+        app.logger.warning("Template %s: %s", template_id, problem)
+        result["warning"] = problem + ". Arabic field values will be rejected."
+    return jsonify(result)
+
+@app.route("/api/templates/<template_id>")
+def get_template(template_id):
+    row = db_fetchone("SELECT name, fields, created_at FROM contract_templates WHERE id=?", (template_id,))
+    if not row:
+        return jsonify({"success": False, "message": "Template not found"}), 404
+    name, fields, created_at = row
+    return jsonify({"success": True, "template_id": template_id, "name": name,
+                    "fields": json.loads(fields), "created_at": created_at})
+
+@app.route("/api/templates/<template_id>/contracts", methods=["POST"])
+def create_contracts_from_template(template_id):
+    """
+    Generate contracts from a template without running LibreOffice.
+    Receives JSON, either a single contract:
+    { "fields": {"second_party": "...", "monthly_fee": "..."}, "client_email": "..." }
+    or a batch:
+    { "contracts": [ {"fields": {...}, "client_email": "..."}, ... ] }
+    """
+    row = db_fetchone("SELECT filename, pdf_filename, fields FROM contract_templates WHERE id=?", (template_id,))
+    if not row:
+        return jsonify({"success": False, "message": "Template not found"}), 404
+    filename, pdf_filename, fields_json = row
+    fields = json.loads(fields_json)
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "message": "Expected a JSON object"}), 400
+    items = data.get("contracts")
+    if items is None:
+        items = [data]
+    if not isinstance(items, list) or not items:
+        return jsonify({"success": False, "message": "No contracts given"}), 400
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("fields") or {}, dict):
+            return jsonify({"success": False, "message": "Each contract must be an object with a \"fields\" object"}), 400
+        if not isinstance(item.get("client_email", ""), str):
+            return jsonify({"success": False, "message": "client_email must be a string"}), 400
+
+    if any(is_rtl_text(str(v)) for item in items for v in (item.get("fields") or {}).values()):
+        problem = rtl_support_problem()
+        if problem:
+            return jsonify({"success": False, "message": problem}), 500
+
+    # Check every contract before writing anything, so a batch is all or nothing
+    font = get_template_font()
+    names = {fd["name"] for fd in fields}
+    errors = []
+    for index, item in enumerate(items):
+        values = item.get("fields") or {}
+        too_long = sorted({fd["name"] for fd in fields
+                           if fit_field_font_size(fd, shape_text(field_value(values, fd["name"])), font) is None})
+        error = {"missing": sorted(names - set(values)), "unknown": sorted(set(values) - names), "too_long": too_long}
+        if any(error.values()):
+            errors.append({"index": index, **error})
+    if errors:
+        return jsonify({"success": False, "message": "Field values don't match the template", "errors": errors}), 400
+
+    base_pdf = (TEMPLATES_DIR / pdf_filename).read_bytes()
+    results, rows, pdf_paths = [], [], []
+    try:
+        for item in items:
+            contract_id = generate_contract_id()
+            pdf_path = PDFS_DIR / f"{contract_id}.pdf"
+            pdf_paths.append(pdf_path)
+            stamp_template_fields(base_pdf, fields, item.get("fields") or {}, pdf_path)
+
+            token = uuid.uuid4().hex[:32]
+            rows.append((contract_id, filename, pdf_path.name, datetime.utcnow().isoformat(), item.get("client_email", ""), token, "created"))
+            results.append({
+                "contract_id": contract_id,
+                "pdf": url_for("serve_pdf", filename=pdf_path.name, _external=True),
+                "sign_link": url_for("sign_page", contract_id=contract_id, token=token, _external=True),
+            })
+
+        db_executemany("""
+          INSERT INTO contracts (id, filename, pdf_filename, created_at, client_email, token, signing_status)
+          VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+    except Exception as e:
+        for pdf_path in pdf_paths:
+            pdf_path.unlink(missing_ok=True)
+        return jsonify({"success": False, "message": "Contract generation failed", "error": str(e)}), 500
+
+    if "contracts" not in data:
+        return jsonify({"success": True, **results[0]})
+    return jsonify({"success": True, "contracts": results})
+
 @app.route("/pdfs/<path:filename>")
 def serve_pdf(filename):
     return send_from_directory(str(PDFS_DIR), filename)
@@ -0,0 +1,202 @@
+# backend/tests/test_contract_templates.py
+import io
+import os
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+from reportlab.pdfgen import canvas as pdfcanvas
+from reportlab.pdfbase import pdfmetrics
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="baft-test-")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import app as backend  # noqa: E402
+
+
+VALUES = {"monthly_fee": "500", "to_date": "2026-12-31", "second_party": "شركة الأمل", "from_date": "2026-01-01"}
+
+
+def place(c, x, y, font, size, text):
+    c.setFont(font, size)
+    c.drawString(x, y, text)
+    return x + pdfmetrics.stringWidth(text, font, size)
+
+
+@pytest.fixture
+def mixed_template(tmp_path):
+    """Template mixing fonts with several placeholders per line; returns (path, expected)."""
+    path = tmp_path / "mixed.pdf"
+    c = pdfcanvas.Canvas(str(path))
+    expected = {}
+
+    # Line 1: Times-Roman sentence with a placeholder mid-run, then Courier text and another one
+    prefix = "The monthly fee is "
+    expected["monthly_fee"] = (72 + pdfmetrics.stringWidth(prefix, "Times-Roman", 11),
+                               pdfmetrics.stringWidth("{{monthly_fee}}", "Times-Roman", 11), 700)
+    x = place(c, 72, 700, "Times-Roman", 11, prefix + "{{monthly_fee}} SAR monthly. ")
+    x = place(c, x, 700, "Courier", 10, "valid until ")
+    expected["to_date"] = (x, pdfmetrics.stringWidth("{{to_date}}", "Courier", 10), 700)
+    place(c, x, 700, "Courier", 10, "{{to_date}} end")
+
+    # Line 2: Arabic run in visual order, placeholder in the middle of it (braces mirrored by bidi)
+    font = backend.get_template_font()
+    visual = backend.shape_text("اسم العميل {{second_party}} المحترم")
+    m = backend.PLACEHOLDER_RE.search(visual)
+    start = 100 + pdfmetrics.stringWidth(visual[:m.start()], font, 14)
+    expected["second_party"] = (start, pdfmetrics.stringWidth(m.group(0), font, 14), 600)
+    place(c, 100, 600, font, 14, visual)
+
+    # Line 3: placeholder whose braces came out as mirrored glyphs, drawn right to left
+    left, token, right = backend.shape_text("من تاريخ") + " ", "}}from_date{{", " " + backend.shape_text("يبدأ العقد")
+    token_x = 100 + pdfmetrics.stringWidth(left, font, 12)
+    right_x = token_x + pdfmetrics.stringWidth(token, font, 12)
+    expected["from_date"] = (token_x, pdfmetrics.stringWidth(token, font, 12), 500)
+    place(c, right_x, 500, font, 12, right)
+    place(c, token_x, 500, font, 12, token)
+    place(c, 100, 500, font, 12, left)
+    c.save()
+    return path, expected
+
+
+def test_extract_fields_uses_template_font_metrics(mixed_template):
+    path, expected = mixed_template
+    fields = {f["name"]: f for f in backend.extract_template_fields(path)}
+    assert set(fields) == set(expected)
+    for name, (x, width, baseline) in expected.items():
+        assert fields[name]["x"] == pytest.approx(x, abs=0.05), name
+        assert fields[name]["width"] == pytest.approx(width, abs=0.05), name
+        assert fields[name]["y"] == pytest.approx(baseline, abs=0.05), name
+
+
+def test_stamp_covers_only_placeholder(mixed_template, tmp_path):
+    path, _ = mixed_template
+    fields = backend.extract_template_fields(path)
+    chars = list(backend.iter_pdf_chars(next(backend.extract_pages(str(path), laparams=None))))
+    for f in fields:
+        covered = sorted((ch for ch in chars
+                          if f["x"] <= (ch.x0 + ch.x1) / 2 <= f["x"] + f["width"]
+                          and f["bottom"] <= (ch.y0 + ch.y1) / 2 <= f["bottom"] + f["height"]),
+                         key=lambda ch: ch.x0)
+        assert backend.PLACEHOLDER_RE.fullmatch("".join(ch.get_text() for ch in covered)), f["name"]
+
+    out = backend.stamp_template_fields(path.read_bytes(), fields, {"monthly_fee": "500"}, tmp_path / "out.pdf")
+    assert "500" in backend.PdfReader(str(out)).pages[0].extract_text()
+
+
+def stamped_chars(template_path, out_path):
+    """Glyphs on the first page of out_path that aren't in the template."""
+    def page_chars(path):
+        return list(backend.iter_pdf_chars(next(backend.extract_pages(str(path), laparams=None))))
+    original = {(ch.get_text(), round(ch.x0, 2), round(ch.y0, 2)) for ch in page_chars(template_path)}
+    return [ch for ch in page_chars(out_path) if (ch.get_text(), round(ch.x0, 2), round(ch.y0, 2)) not in original]
+
+
+def test_long_value_shrinks_to_placeholder_width(mixed_template, tmp_path):
+    path, _ = mixed_template
+    field = next(f for f in backend.extract_template_fields(path) if f["name"] == "monthly_fee")
+    value = "1,250,000.00 SAR"
+    assert pdfmetrics.stringWidth(value, backend.get_template_font(), field["font_size"]) > field["width"]
+
+    out = backend.stamp_template_fields(path.read_bytes(), [field], {"monthly_fee": value}, tmp_path / "out.pdf")
+    chars = sorted(stamped_chars(path, out), key=lambda ch: ch.x0)
+    assert "".join(ch.get_text() for ch in chars) == value
+    assert min(ch.x0 for ch in chars) >= field["x"] - 0.01
+    assert max(ch.x1 for ch in chars) <= field["x"] + field["width"] + 0.01
+
+
+def test_value_too_long_is_rejected(mixed_template, tmp_path):
+    path, _ = mixed_template
+    fields = backend.extract_template_fields(path)
+    with pytest.raises(ValueError, match="monthly_fee"):
+        backend.stamp_template_fields(path.read_bytes(), fields,
+                                      {"monthly_fee": "Al Amal Trading and Contracting Company LLC"}, tmp_path / "out.pdf")
+
+
+def test_zero_value_is_stamped(mixed_template, tmp_path):
+    path, _ = mixed_template
+    fields = backend.extract_template_fields(path)
+    out = backend.stamp_template_fields(path.read_bytes(), fields, {"monthly_fee": 0}, tmp_path / "out.pdf")
+    assert [ch.get_text() for ch in stamped_chars(path, out)] == ["0"]
+
+
+@pytest.fixture
+def client(mixed_template):
+    path, _ = mixed_template
+    fields = backend.extract_template_fields(path)
+    (backend.TEMPLATES_DIR / "TP-TEST.pdf").write_bytes(path.read_bytes())
+    backend.db_execute("INSERT OR REPLACE INTO contract_templates VALUES (?, ?, ?, ?, ?, ?)",
+                       ("TP-TEST", "test", "TP-TEST.docx", "TP-TEST.pdf", json.dumps(fields), "now"))
+    return backend.app.test_client()
+
+
+@pytest.mark.parametrize("body", [
+    [{"fields": {}}],
+    {"contracts": ["x"]},
+    {"contracts": [{"fields": ["x"]}]},
+    {"fields": "x"},
+])
+def test_create_contracts_rejects_malformed_body(client, body):
+    r = client.post("/api/templates/TP-TEST/contracts", json=body)
+    assert r.status_code == 400
+
+
+def test_create_contracts_batch(client):
+    r = client.post("/api/templates/TP-TEST/contracts", json={"contracts": [
+        {"fields": VALUES}, {"fields": {**VALUES, "monthly_fee": 0}, "client_email": "a@example.com"}]})
+    assert r.status_code == 200
+    assert len(r.json["contracts"]) == 2
+
+
+def test_create_contracts_reports_field_mismatches(client):
+    fields = {**VALUES, "secnd_party": "ACME", "monthly_fee": "Al Amal Trading and Contracting Company LLC"}
+    del fields["second_party"]
+    r = client.post("/api/templates/TP-TEST/contracts", json={"contracts": [{"fields": VALUES}, {"fields": fields}]})
+    assert r.status_code == 400
+    assert r.json["errors"] == [{"index": 1, "missing": ["second_party"], "unknown": ["secnd_party"],
+                                 "too_long": ["monthly_fee"]}]
+
+
+def test_invalid_batch_writes_nothing(client):
+    before = set(backend.PDFS_DIR.iterdir())
+    count = backend.db_fetchone("SELECT COUNT(*) FROM contracts")[0]
+    r = client.post("/api/templates/TP-TEST/contracts", json={"contracts": [
+        {"fields": VALUES}, {"fields": VALUES, "client_email": {"a": 1}}]})
+    assert r.status_code == 400
+    assert set(backend.PDFS_DIR.iterdir()) == before
+    assert backend.db_fetchone("SELECT COUNT(*) FROM contracts")[0] == count
+
+
+def test_arabic_values_rejected_without_shaping(client, monkeypatch):
+    monkeypatch.setattr(backend, "arabic_reshaper", None)
+    r = client.post("/api/templates/TP-TEST/contracts", json={"fields": VALUES})
+    assert r.status_code == 500
+    r = client.post("/api/templates/TP-TEST/contracts", json={"fields": {**VALUES, "second_party": "ACME"}})
+    assert r.status_code == 200
+
+
+def test_upload_without_placeholders_removes_files(monkeypatch):
+    def fake_convert(docx_path, out_dir):
+        pdf_path = out_dir / docx_path.with_suffix(".pdf").name
+        c = pdfcanvas.Canvas(str(pdf_path))
+        c.drawString(72, 700, "No fields here")
+        c.save()
+        return pdf_path
+
+    monkeypatch.setattr(backend, "convert_docx_to_pdf", fake_convert)
+    before = set(backend.TEMPLATES_DIR.iterdir())
+    r = backend.app.test_client().post("/api/templates/upload", data={"file": (io.BytesIO(b"docx"), "empty.docx")})
+    assert r.status_code == 400
+    assert set(backend.TEMPLATES_DIR.iterdir()) == before
+
+
+def test_upload_without_libreoffice_removes_files(monkeypatch):
+    def missing_libreoffice(docx_path, out_dir):
+        raise FileNotFoundError("libreoffice")
+
+    monkeypatch.setattr(backend, "convert_docx_to_pdf", missing_libreoffice)
+    before = set(backend.TEMPLATES_DIR.iterdir())
+    r = backend.app.test_client().post("/api/templates/upload", data={"file": (io.BytesIO(b"docx"), "t.docx")})
+    assert r.status_code == 500
+    assert set(backend.TEMPLATES_DIR.iterdir()) == before